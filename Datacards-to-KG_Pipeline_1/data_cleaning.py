@@ -1,6 +1,7 @@
 import os
-import json
+import orjson
 import re
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict
 
 # === CONFIG ===
@@ -8,9 +9,47 @@ RAW_FOLDER = "kaggle_datacards/meta_data"
 CLEAN_FOLDER = "clean_data"
 os.makedirs(CLEAN_FOLDER, exist_ok=True)
 
-# === Metadata Cleaning Functions ===
-import re
+# === Precompiled Patterns ===
+# Compiled once at import — these run on every field of every datacard
+_EMOJI_RE = re.compile(r"[\U0001F300-\U0001FAFF\U00002700-\U000027BF\U0001F900-\U0001F9FF]+", flags=re.UNICODE)
+_WS_RE = re.compile(r"\s+")
+
+# Line-level rules still need regex (anchors/positions), but they are cheap
+_HR_RE = re.compile(r"^-{2,}$", flags=re.MULTILINE)
+_MD_SEP_RE = re.compile(r"-{3,}")
+
+_KEEP_EXTRA = frozenset(".,;:()[]%-")
+
+class _DropTable(dict):
+    """Lazily-built str.translate table that deletes emojis and special
+    characters (everything outside \\w, whitespace and basic punctuation).
+    Each code point is classified once, then looked up branch-free in C."""
+    def __missing__(self, code):
+        ch = chr(code)
+        keep = ch.isalnum() or ch == "_" or ch.isspace() or ch in _KEEP_EXTRA
+        result = code if keep else None
+        self[code] = result
+        return result
+
+_DROP_TABLE = _DropTable()
+
+# ASCII-only variant of the drop rule: with re.ASCII the class needs no
+# emoji ranges at all, since isascii() input can't contain them
+_ASCII_CLEAN_RE = re.compile(r"[^\w\s.,;:()\[\]%-]", re.ASCII)
+
+class _UriSuffixTable(dict):
+    """Translate table mapping anything outside [a-zA-Z0-9_] to an underscore,
+    classified lazily per code point like _DropTable."""
+    def __missing__(self, code):
+        ch = chr(code)
+        keep = "a" <= ch <= "z" or "A" <= ch <= "Z" or "0" <= ch <= "9" or ch == "_"
+        result = code if keep else "_"
+        self[code] = result
+        return result
+
+_URI_SUFFIX_TABLE = _UriSuffixTable()
 
+# === Metadata Cleaning Functions ===
 def clean_metadata(metadata: Dict) -> Dict:
     datatype_map = {
         "sc:Text": "xsd:string",
@@ -20,9 +59,7 @@ def clean_metadata(metadata: Dict) -> Dict:
     }
 
     def remove_emojis(text: str) -> str:
-        # Regex for wide unicode ranges covering emojis/symbols
-        emoji_pattern = re.compile("[\U0001F300-\U0001FAFF\U00002700-\U000027BF\U0001F900-\U0001F9FF]+", flags=re.UNICODE)
-        return emoji_pattern.sub("", text).strip()
+        return _EMOJI_RE.sub("", text).strip()
 
     # Clean dataset-level info
     dataset_name_raw = metadata.get("name", "").strip()
@@ -46,7 +83,7 @@ def clean_metadata(metadata: Dict) -> Dict:
             except KeyError:
                 source_column = name
 
-            uri_suffix = re.sub(r"[^a-zA-Z0-9_]", "_", name) + "Field"
+            uri_suffix = name.translate(_URI_SUFFIX_TABLE) + "Field"
 
             cleaned_fields.append({
                 "name": name,
@@ -63,42 +100,51 @@ def clean_metadata(metadata: Dict) -> Dict:
     }
 
 def clean_description(desc: str) -> str:
-    # Remove emojis & symbols
-    desc = re.sub(r"[\U0001F300-\U0001FAFF\U00002700-\U000027BF\U0001F900-\U0001F9FF]+", "", desc, flags=re.UNICODE)
-    # Remove horizontal rules, --- or ----- lines
-    desc = re.sub(r"^-{2,}$", "", desc, flags=re.MULTILINE)
-    # Remove markdown separators like "---"
-    desc = re.sub(r"-{3,}", " ", desc)
-    # Clean special characters (keep words, digits, punctuation)
-    desc = re.sub(r"[^\w\s.,;:()\[\]%-]", "", desc)
+    # Remove horizontal rules, then turn inline --- separators into a space
+    desc = _HR_RE.sub("", desc)
+    desc = _MD_SEP_RE.sub(" ", desc)
+    # Drop emojis & special characters; most descriptions are plain ASCII,
+    # which gets a fast path that never touches the unicode classification
+    if desc.isascii():
+        desc = _ASCII_CLEAN_RE.sub("", desc)
+    else:
+        desc = desc.translate(_DROP_TABLE)
     # Normalize whitespaces
-    desc = re.sub(r"\s+", " ", desc)
+    desc = _WS_RE.sub(" ", desc)
     return desc.strip()
 
+# === Batch Processing ===
+def _process_one(paths) -> str:
+    """Clean a single metadata file (module-level so it pickles for workers)."""
+    path_in, path_out = paths
+    # orjson parses/serializes UTF-8 bytes directly, several times faster
+    # than the stdlib json module on these datacards
+    with open(path_in, "rb") as f:
+        metadata = orjson.loads(f.read())
 
+    cleaned = clean_metadata(metadata)
 
+    # Write to a sibling tmp file and rename — os.replace is atomic, so a
+    # crashed run never leaves a truncated JSON behind
+    tmp_path = path_out + ".tmp"
+    with open(tmp_path, "wb") as out_f:
+        out_f.write(orjson.dumps(cleaned, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, path_out)
 
-def clean_description(desc: str) -> str:
-    desc = re.sub(r"[^\w\s.,;:()\[\]%-]", "", desc)
-    desc = re.sub(r"\s+", " ", desc)
-    return desc.strip()
+    return path_out
 
-# === Batch Processing ===
 def process_all_metadata():
-    files = [f for f in os.listdir(RAW_FOLDER) if f.endswith(".json")]
-    print(f"Found {len(files)} files in {RAW_FOLDER}...")
-
-    for file in files:
-        with open(os.path.join(RAW_FOLDER, file), "r", encoding="utf-8") as f:
-            metadata = json.load(f)
-
-        cleaned = clean_metadata(metadata)
+    # scandir yields name and path in one syscall pass, no per-file join
+    entries = [e for e in os.scandir(RAW_FOLDER) if e.name.endswith(".json")]
+    print(f"Found {len(entries)} files in {RAW_FOLDER}...")
 
-        out_path = os.path.join(CLEAN_FOLDER, file)
-        with open(out_path, "w", encoding="utf-8") as out_f:
-            json.dump(cleaned, out_f, indent=2)
+    pairs = [(e.path, os.path.join(CLEAN_FOLDER, e.name)) for e in entries]
 
-        print(f"✅ Cleaned & saved: {out_path}")
+    # The regex/translate cleaning is CPU-bound, so spread files across cores;
+    # chunksize amortizes the pickling overhead per task
+    with ProcessPoolExecutor() as ex:
+        for out_path in ex.map(_process_one, pairs, chunksize=8):
+            print(f"✅ Cleaned & saved: {out_path}")
 
 if __name__ == "__main__":
     process_all_metadata()
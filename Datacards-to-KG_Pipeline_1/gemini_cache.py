@@ -0,0 +1,33 @@
+import os
+import hashlib
+
+# === CONFIG ===
+# Tiny file-based cache for Gemini RDF outputs, keyed by a hash of the full
+# prompt. Re-running a pipeline after a crash (or with only a few new
+# datacards) skips every API call whose prompt hasn't changed.
+CACHE_FOLDER = "gemini_cache"
+
+
+def _cache_path(prompt: str) -> str:
+    digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(CACHE_FOLDER, f"{digest}.rdf")
+
+
+def get(prompt: str):
+    """Return the cached RDF for this prompt, or None on a miss."""
+    path = _cache_path(prompt)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    return None
+
+
+def put(prompt: str, rdf_text: str):
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    # Atomic write so a crash can't leave a truncated entry that would
+    # poison every later run with a bad cache hit
+    path = _cache_path(prompt)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(rdf_text.encode("utf-8"))
+    os.replace(tmp_path, path)
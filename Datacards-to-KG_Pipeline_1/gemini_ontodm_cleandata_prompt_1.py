@@ -1,7 +1,10 @@
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import google.generativeai as genai
 
+import gemini_cache
+
 # === CONFIG ===
 CLEAN_FOLDER = "clean_data"
 OUTPUT_FOLDER = "ttl_outputs"
@@ -16,13 +19,8 @@ genai.configure(api_key=GEMINI_API_KEY)
 model = genai.GenerativeModel(GEMINI_MODEL)
 
 # === Prompt Builder ===
-def build_prompt(metadata: dict) -> str:
-    dataset_name = metadata.get("dataset_name", "UnnamedDataset").replace('"', '')
-    dataset_description = metadata.get("dataset_description", "").replace('"', '')
-
-    fields_json = json.dumps(metadata.get("fields", []), indent=2)
-
-    prompt = f"""
+# Static instructions/example block, rendered once at import time
+_PROMPT_HEAD = f"""
 You are an ontology expert. Given a dataset JSON, generate RDF triples in Turtle syntax using the OntoDM ontology.
 
 Ontology URI: {ONTODM_URI}
@@ -48,7 +46,15 @@ Example:
     ontodm:hasName "Example Dataset" ;
     ontodm:hasDescription "This is a demo dataset." .
 
-Now process this JSON:
+"""
+
+def build_prompt(metadata: dict) -> str:
+    dataset_name = metadata.get("dataset_name", "UnnamedDataset").replace('"', '')
+    dataset_description = metadata.get("dataset_description", "").replace('"', '')
+
+    fields_json = json.dumps(metadata.get("fields", []), indent=2)
+
+    return _PROMPT_HEAD + f"""Now process this JSON:
 Dataset Name: {dataset_name}
 Dataset Description: {dataset_description}
 
@@ -57,32 +63,48 @@ Fields JSON:
 
 Output RDF triples below:
 """
-    return prompt
 
 # === Main Loop ===
-def main():
-    files = [f for f in os.listdir(CLEAN_FOLDER) if f.endswith(".json")]
-    print(f"Found {len(files)} cleaned metadata files...")
+def process_file(file: str, file_path: str):
+    with open(file_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
 
-    for file in files:
-        file_path = os.path.join(CLEAN_FOLDER, file)
-        with open(file_path, "r", encoding="utf-8") as f:
-            metadata = json.load(f)
+    print(f"→ Extracting RDF for: {file}")
 
-        print(f"→ Extracting RDF for: {file}")
+    prompt = build_prompt(metadata)
 
-        prompt = build_prompt(metadata)
+    rdf_text = gemini_cache.get(prompt)
+    if rdf_text is None:
         response = model.generate_content(prompt)
-
         rdf_text = response.text.strip()
+        gemini_cache.put(prompt, rdf_text)
+    else:
+        print(f"♻️ Cache hit for: {file}")
 
-        dataset_id = metadata.get("dataset_name", file.replace(".json", "")).replace(" ", "_").replace("/", "_")
-        output_ttl_path = os.path.join(OUTPUT_FOLDER, f"{dataset_id}.ttl")
+    dataset_id = metadata.get("dataset_name", file.replace(".json", "")).replace(" ", "_").replace("/", "_")
+    output_ttl_path = os.path.join(OUTPUT_FOLDER, f"{dataset_id}.ttl")
 
-        with open(output_ttl_path, "w", encoding="utf-8") as out_f:
-            out_f.write(rdf_text)
+    # Atomic write: tmp file + os.replace, so no truncated TTL survives a crash
+    tmp_path = output_ttl_path + ".tmp"
+    with open(tmp_path, "wb") as out_f:
+        out_f.write(rdf_text.encode("utf-8"))
+    os.replace(tmp_path, output_ttl_path)
 
-        print(f"✅ Saved RDF triples to: {output_ttl_path}")
+    print(f"✅ Saved RDF triples to: {output_ttl_path}")
+
+def main():
+    # scandir yields name and path in one syscall pass, no per-file join
+    entries = [e for e in os.scandir(CLEAN_FOLDER) if e.name.endswith(".json")]
+    print(f"Found {len(entries)} cleaned metadata files...")
+
+    # Gemini calls are network-bound, so overlap them across threads
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        futures = {ex.submit(process_file, e.name, e.path): e.name for e in entries}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Failed on {futures[future]}: {e}")
 
 if __name__ == "__main__":
     main()
@@ -1,28 +1,42 @@
 import os
+import re
 import json
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted
 
 # === CONFIG ===
 CLEAN_FOLDER = "clean_data"
 OUTPUT_FOLDER = "ttl_outputs_enrichment"
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+MAX_CONCURRENT_REQUESTS = 20  # Match your Gemini QPM tier
+MAX_RETRIES = 5
+
+# Markdown code fences (with optional "turtle" language tag) around the RDF output
+_FENCE_RE = re.compile(r"```(?:turtle)?")
+
 GEMINI_MODEL = "models/gemini-1.5-flash"
 GEMINI_API_KEY = "your_api_key_here"  # Replace with your actual API key
 ONTODM_URI = "https://purl.org/ontodm"
 
 # === Gemini Setup ===
-genai.configure(api_key=GEMINI_API_KEY)
+# grpc_asyncio keeps one pooled gRPC channel alive across all requests
+# instead of re-establishing transport per call
+genai.configure(api_key=GEMINI_API_KEY, transport="grpc_asyncio")
 model = genai.GenerativeModel(GEMINI_MODEL)
 
 # === Prompt Builder ===
-def build_prompt(metadata: dict) -> str:
-    dataset_name = metadata.get("dataset_name", "UnnamedDataset").replace('"', '')
-    dataset_description = metadata.get("dataset_description", "").replace('"', '')
-
-    fields_json = json.dumps(metadata.get("fields", []), indent=2)
-
-    prompt = f"""
+@functools.lru_cache(maxsize=4096)
+def _fields_json(fields_key: str) -> str:
+    # Memoize the pretty-printed serialization keyed by a stable compact form,
+    # so re-runs over partially-new inputs skip the O(n) indent pass
+    return json.dumps(json.loads(fields_key), indent=2)
+
+# Static instructions/example block, rendered once at import time
+_PROMPT_HEAD = f"""
 You are an ontology expert. Given a dataset and its metadata, generate RDF triples in Turtle syntax using the OntoDM ontology.
 
 Ontology URI: {ONTODM_URI}
@@ -59,8 +73,14 @@ Example:
 
 
 """
-    
-    prompt += f"""
+
+def build_prompt(metadata: dict) -> str:
+    dataset_name = metadata.get("dataset_name", "UnnamedDataset").replace('"', '')
+    dataset_description = metadata.get("dataset_description", "").replace('"', '')
+
+    fields_json = _fields_json(json.dumps(metadata.get("fields", []), sort_keys=True))
+
+    return _PROMPT_HEAD + f"""
 ### Now generate RDF triples for the dataset below.
 
 Dataset Name: {dataset_name}
@@ -71,38 +91,86 @@ Fields JSON:
 
 Output RDF triples:
 """
-    return prompt
 
-    return prompt
+# === File Helpers ===
+def read_metadata(file_path: str) -> dict:
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_ttl(output_ttl_path: str, rdf_text: str):
+    # Atomic write: tmp file + os.replace, so no truncated TTL survives a crash
+    tmp_path = output_ttl_path + ".tmp"
+    with open(tmp_path, "wb") as out_f:
+        out_f.write(rdf_text.encode("utf-8"))
+    os.replace(tmp_path, output_ttl_path)
+
+# === Async Processing ===
+async def process_file(file: str, metadata: dict, sem: asyncio.Semaphore, io_pool: ThreadPoolExecutor):
+    print(f"→ Extracting RDF for: {file}")
+
+    prompt = build_prompt(metadata)
+
+    dataset_id = metadata.get("dataset_name", file.replace(".json", "")).replace(" ", "_").replace("/", "_")
+    output_ttl_path = os.path.join(OUTPUT_FOLDER, f"{dataset_id}.ttl")
+    loop = asyncio.get_running_loop()
+
+    tmp_path = output_ttl_path + ".tmp"
+
+    async with sem:
+        for attempt in range(MAX_RETRIES):
+            try:
+                # Stream the generation and append chunks to a tmp file as
+                # they arrive, overlapping LLM compute with file I/O; the
+                # real path only appears via os.replace once the stream is
+                # complete, so a crash or mid-stream error can't leave a
+                # truncated TTL behind
+                response = await model.generate_content_async(prompt, stream=True)
+                parts = []
+                with open(tmp_path, "w", encoding="utf-8") as out_f:
+                    async for chunk in response:
+                        parts.append(chunk.text)
+                        await loop.run_in_executor(io_pool, out_f.write, chunk.text)
+                break
+            except ResourceExhausted:
+                # Exponential backoff when we hit the rate limit
+                wait = 2 ** attempt
+                print(f"⏳ Rate limited on {file}, retrying in {wait}s...")
+                await asyncio.sleep(wait)
+        else:
+            raise RuntimeError(f"Gave up on {file} after {MAX_RETRIES} retries")
+
+    # Clean up Markdown-style code blocks once the stream is complete
+    raw_text = "".join(parts)
+    rdf_text = _FENCE_RE.sub("", raw_text).strip()
+    if rdf_text != raw_text:
+        # write_ttl rewrites through its own tmp file and replaces atomically
+        await loop.run_in_executor(io_pool, write_ttl, output_ttl_path, rdf_text)
+    else:
+        # No fences to strip — publish the streamed tmp file as-is
+        os.replace(tmp_path, output_ttl_path)
+
+    print(f"✅ Saved RDF triples to: {output_ttl_path}")
 
 # === Main Loop ===
-def main():
-
-
-    files = [f for f in os.listdir(CLEAN_FOLDER) if f.endswith(".json")]
-    print(f"Found {len(files)} cleaned metadata files...")
-
-    for file in files:
-        file_path = os.path.join(CLEAN_FOLDER, file)
-        with open(file_path, "r", encoding="utf-8") as f:
-            metadata = json.load(f)
-
-        print(f"→ Extracting RDF for: {file}")
-
-        prompt = build_prompt(metadata)
-        response = model.generate_content(prompt)
-
-        rdf_text = response.text.strip()
-        # Clean up Markdown-style code blocks and redundant prefixes
-        rdf_text = rdf_text.replace("```turtle", "").replace("```", "").strip()
-
-        dataset_id = metadata.get("dataset_name", file.replace(".json", "")).replace(" ", "_").replace("/", "_")
-        output_ttl_path = os.path.join(OUTPUT_FOLDER, f"{dataset_id}.ttl")
-
-        with open(output_ttl_path, "w", encoding="utf-8") as out_f:
-            out_f.write(rdf_text)
-
-        print(f"✅ Saved RDF triples to: {output_ttl_path}")
+async def main():
+    # scandir yields name and path in one syscall pass, no per-file join
+    entries = [e for e in os.scandir(CLEAN_FOLDER) if e.name.endswith(".json")]
+    print(f"Found {len(entries)} cleaned metadata files...")
+
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    with ThreadPoolExecutor(max_workers=16) as io_pool:
+        # Read all metadata JSONs concurrently before hitting the API
+        metadatas = list(io_pool.map(lambda e: read_metadata(e.path), entries))
+
+        results = await asyncio.gather(
+            *(process_file(e.name, meta, sem, io_pool) for e, meta in zip(entries, metadatas)),
+            return_exceptions=True
+        )
+
+    failures = [(e.name, r) for e, r in zip(entries, results) if isinstance(r, Exception)]
+    for file, err in failures:
+        print(f"❌ Failed on {file}: {err}")
+    print(f"Done: {len(entries) - len(failures)} succeeded, {len(failures)} failed.")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
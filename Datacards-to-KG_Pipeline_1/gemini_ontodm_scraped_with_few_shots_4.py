@@ -1,12 +1,19 @@
 import os
-import json
+import re
+import orjson
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import google.generativeai as genai
 
+import gemini_cache
+
 # === CONFIG ===
 CLEAN_FOLDER = "scraped_metadata"
 OUTPUT_FOLDER = "ttl_outputs_enrichment_prompts_with_examples"
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+# Leading/trailing Markdown code fences (with optional "turtle" tag)
+_FENCE_RE = re.compile(r"^`{3}(?:turtle)?\s*|\s*`{3}\s*$", re.IGNORECASE)
+
 GEMINI_MODEL = "models/gemini-1.5-flash"
 GEMINI_API_KEY = "your_api_key_here"  # Replace with your actual API key
 ONTODM_URI = "https://purl.org/ontodm"
@@ -16,10 +23,9 @@ genai.configure(api_key=GEMINI_API_KEY)
 model = genai.GenerativeModel(GEMINI_MODEL)
 
 # === Prompt Builder ===
-def build_prompt(metadata: dict, license_name: str) -> str:
-    raw_text = json.dumps(metadata, indent=2)
-
-    prompt = """
+# Static instructions/example block, rendered once at import time (the
+# doubled braces in the example JSON are no longer needed without .format)
+_PROMPT_HEAD = """
 You are an expert ontology population assistant. Your task is to generate RDF triples in Turtle format using the OntoDM ontology (https://purl.org/ontodm#) and Dublin Core Terms (https://purl.org/dc/terms/), given any unstructured dataset metadata.
 
 ---
@@ -68,11 +74,11 @@ https://purl.org/ontodm#
 ---
 ### Example:
 Input Metadata:
-{{
+{
   "title": "Cancer Severity Predictor",
   "description": "This model predicts the severity of cancer based on patient features. It includes 5 features and was trained on 10,000 examples.",
-  "licenses": [{{"name": "CC0"}}]
-}}
+  "licenses": [{"name": "CC0"}]
+}
 
 Output RDF Triples:
 @prefix ontodm: <https://purl.org/ontodm#> .
@@ -88,73 +94,74 @@ ex:Cancer_Severity_Predictor a ontodm:predictive_model_representation ;
     dcterms:license <https://creativecommons.org/publicdomain/zero/1.0/> .
 
 
-### Input Metadata:
-{0}
+"""
+
+def build_prompt(raw_text: str, license_name: str) -> str:
+    return _PROMPT_HEAD + f"""### Input Metadata:
+{raw_text}
 
 ---
 
 ### Output RDF Triples:
-""".format(raw_text)
-
-    return prompt
-
-
-    return prompt
+"""
 
 # === Main Loop ===
-def main():
-    files = [f for f in os.listdir(CLEAN_FOLDER) if f.endswith(".json")]
-    print(f"Found {len(files)} cleaned metadata files...")
-
-    for file in files:
-        file_path = os.path.join(CLEAN_FOLDER, file)
-
-        # Load JSON
-        with open(file_path, "r", encoding="utf-8") as f:
-            metadata_raw = json.load(f)
+def process_file(file: str, file_path: str):
+    # Read the raw bytes once — the prompt embeds the original JSON text
+    # as-is, so parsing is only needed for the license/title lookups
+    with open(file_path, "rb") as f:
+        raw_bytes = f.read()
 
-        # Parse embedded JSON string
-        metadata = metadata_raw
+    metadata = orjson.loads(raw_bytes)
 
-        # Extract license mapping
-        license_name = ""
-        licenses = metadata.get("licenses", [])
-        if licenses:
-            license_name = licenses[0].get("name", "")
+    # Extract license mapping (one pass; the old second block re-read the
+    # list only to assign a license_url that nothing consumed)
+    license_name = ""
+    licenses = metadata.get("licenses", [])
+    if licenses:
+        license_name = licenses[0].get("name", "")
 
-        license_list = metadata.get("licenses", [])
-        if license_list:
-            license_name = license_list[0].get("name", "")
-            if "CC0" in license_name:
-                license_url = "https://creativecommons.org/publicdomain/zero/1.0/"
-            elif "Community Data License" in license_name:
-                license_url = "https://cdla.dev/sharing-1-0/"
+    print(f"→ Extracting RDF for: {file}")
 
-        
+    prompt = build_prompt(raw_bytes.decode("utf-8"), license_name)
 
-        print(f"→ Extracting RDF for: {file}")
+    rdf_text = gemini_cache.get(prompt)
+    if rdf_text is None:
+        response = model.generate_content(prompt)
 
-        prompt = build_prompt(metadata, license_name)
+        # Strip Markdown code fences (and the optional "turtle" tag) in one pass
+        rdf_text = _FENCE_RE.sub("", response.text.strip()).strip()
 
-        response = model.generate_content(prompt)
+        gemini_cache.put(prompt, rdf_text)
+    else:
+        print(f"♻️ Cache hit for: {file}")
 
-        rdf_text = response.text.strip()
 
-        # Remove triple backticks if present
-        if rdf_text.startswith("```"):
-            rdf_text = rdf_text.strip("`").strip()
-        # Also strip possible language label e.g. ```turtle
-        if rdf_text.lower().startswith("turtle"):
-            rdf_text = rdf_text[len("turtle"):].strip()
+    dataset_name = metadata.get("title", file.replace(".json", "")).replace(" ", "_").replace("/", "_")
+    output_ttl_path = os.path.join(OUTPUT_FOLDER, f"{dataset_name}.ttl")
 
+    # Atomic write: tmp file + os.replace, so no truncated TTL survives a crash
+    tmp_path = output_ttl_path + ".tmp"
+    with open(tmp_path, "wb") as out_f:
+        out_f.write(rdf_text.encode("utf-8"))
+    os.replace(tmp_path, output_ttl_path)
 
-        dataset_name = metadata.get("title", file.replace(".json", "")).replace(" ", "_").replace("/", "_")
-        output_ttl_path = os.path.join(OUTPUT_FOLDER, f"{dataset_name}.ttl")
+    print(f"✅ Saved RDF triples to: {output_ttl_path}")
 
-        with open(output_ttl_path, "w", encoding="utf-8") as out_f:
-            out_f.write(rdf_text)
 
-        print(f"✅ Saved RDF triples to: {output_ttl_path}")
+def main():
+    # scandir yields name and path in one syscall pass, no per-file join
+    entries = [e for e in os.scandir(CLEAN_FOLDER) if e.name.endswith(".json")]
+    print(f"Found {len(entries)} cleaned metadata files...")
+
+    # Gemini calls are network-bound, so overlap them across threads
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        futures = {ex.submit(process_file, e.name, e.path): e.name for e in entries}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Failed on {futures[future]}: {e}")
 
 
 if __name__ == "__main__":
@@ -4,10 +4,13 @@ import os
 import re
 import logging
 import pickle
+import orjson
 import faiss
 import numpy as np
 import pandas as pd
-from types import SimpleNamespace
+import torch
+from dataclasses import dataclass
+from collections import defaultdict
 
 from dotenv import load_dotenv
 from neo4j import GraphDatabase, exceptions as neo4j_exceptions
@@ -16,10 +19,40 @@ from langchain_community.embeddings import HuggingFaceEmbeddings
 from KG_query import generate_cypher
 from csv_to_neo4j_loader import load_csv_to_neo4j
 
+# Precompiled parameter-extraction patterns (hot interactive path)
+NAME_RE = re.compile(r"'(.+?)'")
+LICENSE_RE = re.compile(r"license (?:is|=) '(.+?)'", re.IGNORECASE)
+
+class PassageStore:
+    """Lazily decodes passages from an mmap'ed byte blob + offset table"""
+
+    def __init__(self, bin_path: str, offsets_path: str):
+        self._data = np.memmap(bin_path, dtype=np.uint8, mode="r")
+        self._offsets = np.load(offsets_path)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self._data[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+@dataclass(slots=True)
+class Doc:
+    """Retrieved passage with optional KG metadata; slots keep per-doc overhead low"""
+    page_content: str
+    metadata: dict = None
+    similarity_score: float = 0.0
+    uri: str = ""
+    label: str = ""
+    description: str = ""
+
 def main():
     load_dotenv()
     logging.basicConfig(level=logging.INFO)
 
+    # Use all cores for FAISS's SIMD/OpenMP search kernels
+    faiss.omp_set_num_threads(os.cpu_count())
+
     # — Load Neo4j credentials —
     uri  = os.getenv("NEO4J_URI", "bolt://localhost:7687")
     user = os.getenv("NEO4J_USER", "neo4j")
@@ -28,10 +61,14 @@ def main():
 
     # — Attempt a quick auth check —
     try:
-        driver = GraphDatabase.driver(uri, auth=(user, pw))
-        # try opening & closing a session right away
-        with driver.session() as session:
-            session.run("RETURN 1")
+        driver = GraphDatabase.driver(
+            uri,
+            auth=(user, pw),
+            max_connection_pool_size=int(os.getenv("NEO4J_POOL", 50)),
+            connection_acquisition_timeout=60
+        )
+        # cheaper than opening a session and running a throwaway query
+        driver.verify_connectivity()
     except neo4j_exceptions.AuthError:
         print(f"❌ Authentication failed when connecting to Neo4j at {uri}")
         print("   Please verify NEO4J_USER and NEO4J_PASSWORD in your .env")
@@ -43,17 +80,30 @@ def main():
     project_root = os.path.dirname(os.path.abspath(__file__))
 
     # — Embedding model setup —
-    hf = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    device = os.getenv("EMBED_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+    hf = HuggingFaceEmbeddings(
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        model_kwargs={"device": device},
+        encode_kwargs={"batch_size": 64, "normalize_embeddings": True}
+    )
     embed_model = hf.client
+    if device == "cuda":
+        # fp16 halves VRAM and roughly doubles encode throughput; lossless for MiniLM retrieval
+        embed_model.half()
 
     # — Load enhanced FAISS index and data —
     data_folder = os.path.join(project_root, "data_folder")
     
     # Updated path to match the new indexer output
     faiss_idx_path = os.path.join(data_folder, "passages.index")
+    passages_bin_path = os.path.join(data_folder, "text_data.bin")
+    offsets_path = os.path.join(data_folder, "offsets.npy")
     passages_path = os.path.join(data_folder, "passages.pkl")
-    metadata_path = os.path.join(data_folder, "metadata.pkl")
-    relationships_path = os.path.join(data_folder, "relationships.pkl")
+    metadata_path = os.path.join(data_folder, "metadata.json")
+    legacy_metadata_path = os.path.join(data_folder, "metadata.pkl")
+    relationships_path = os.path.join(data_folder, "relationships.parquet")
+    feather_relationships_path = os.path.join(data_folder, "relationships.feather")
+    legacy_relationships_path = os.path.join(data_folder, "relationships.pkl")
 
     # Check if files exist
     if not os.path.exists(faiss_idx_path):
@@ -64,54 +114,109 @@ def main():
     logging.info("Loading enhanced FAISS index from %s", faiss_idx_path)
     index = faiss.read_index(faiss_idx_path)
 
-    logging.info("Loading enriched passages from %s", passages_path)
-    with open(passages_path, "rb") as f:
-        texts = pickle.load(f)
+    # IVF-based indexes need nprobe tuned; no-op for flat indexes
+    if hasattr(index, "nprobe"):
+        index.nprobe = int(os.getenv("FAISS_NPROBE", 16))
+
+    # Queries are encoded with normalize_embeddings=True, so scores are cosine
+    # similarities against an inner-product index. An old L2 index would silently
+    # rank differently — tell the user to rebuild instead.
+    if index.metric_type == faiss.METRIC_L2:
+        logging.warning(
+            "Index at %s uses L2 distance; rerun the indexer to get the "
+            "normalized inner-product (cosine) index.", faiss_idx_path
+        )
+
+    if os.path.exists(passages_bin_path) and os.path.exists(offsets_path):
+        # mmap keeps startup RSS flat — only retrieved passages get decoded
+        logging.info("Memory-mapping enriched passages from %s", passages_bin_path)
+        texts = PassageStore(passages_bin_path, offsets_path)
+    else:
+        logging.info("Loading enriched passages from %s", passages_path)
+        with open(passages_path, "rb") as f:
+            texts = pickle.load(f)
 
-    # Load metadata if available
+    # Load metadata if available (JSON is the current format, pickle the legacy one)
     metadata = []
     if os.path.exists(metadata_path):
         logging.info("Loading passage metadata from %s", metadata_path)
         with open(metadata_path, "rb") as f:
+            metadata = orjson.loads(f.read())
+    elif os.path.exists(legacy_metadata_path):
+        logging.info("Loading passage metadata from %s", legacy_metadata_path)
+        with open(legacy_metadata_path, "rb") as f:
             metadata = pickle.load(f)
-    
-    # Load relationships if available
+
+    # Load relationships if available (Parquet is the current format; Feather
+    # and pickle are the legacy ones)
     relationships_df = pd.DataFrame()
     if os.path.exists(relationships_path):
         logging.info("Loading relationships from %s", relationships_path)
-        with open(relationships_path, "rb") as f:
+        relationships_df = pd.read_parquet(relationships_path)
+    elif os.path.exists(feather_relationships_path):
+        logging.info("Loading relationships from %s", feather_relationships_path)
+        relationships_df = pd.read_feather(feather_relationships_path)
+    elif os.path.exists(legacy_relationships_path):
+        logging.info("Loading relationships from %s", legacy_relationships_path)
+        with open(legacy_relationships_path, "rb") as f:
             relationships_df = pickle.load(f)
 
+    # Build O(1) adjacency indices once so per-query lookups skip pandas entirely
+    rels_by_source = defaultdict(list)
+    rels_by_target = defaultdict(list)
+    num_relationships = len(relationships_df)
+    if not relationships_df.empty:
+        # Memoize the URI fragment ("short label") once per relationship so the
+        # per-query path never re-splits identical URIs
+        for rel in relationships_df[['source', 'type', 'target']].itertuples(index=False):
+            rels_by_source[rel.source].append((rel.type, rel.target.rsplit('#', 1)[-1]))
+            rels_by_target[rel.target].append((rel.type, rel.source.rsplit('#', 1)[-1]))
+        # The DataFrame is no longer needed at query time
+        del relationships_df
+
     # — Enhanced retriever with metadata —
+    def retrieve_docs_batch(queries: list, k: int = 5):
+        """Batched retrieval: one encoder forward pass and one FAISS search for N queries"""
+        # encode already returns float32 for MiniLM — copy=False skips a redundant allocation
+        vecs = embed_model.encode(
+            queries,
+            batch_size=32,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype(np.float32, copy=False).reshape(len(queries), -1)
+        D, I = index.search(vecs, k)
+
+        all_docs = []
+        for row_idx in range(len(queries)):
+            retrieved_docs = []
+            for idx, score in zip(I[row_idx], D[row_idx]):
+                doc_content = texts[idx]
+
+                # Create enhanced document with metadata if available
+                if metadata and idx < len(metadata):
+                    meta = metadata[idx]
+                    doc = Doc(
+                        page_content=doc_content,
+                        metadata=meta,
+                        similarity_score=float(score),
+                        uri=meta.get('uri', ''),
+                        label=meta.get('label', ''),
+                        description=meta.get('description', '')
+                    )
+                else:
+                    doc = Doc(
+                        page_content=doc_content,
+                        similarity_score=float(score)
+                    )
+
+                retrieved_docs.append(doc)
+            all_docs.append(retrieved_docs)
+
+        return all_docs
+
     def retrieve_docs(query: str, k: int = 5):
-        """Enhanced retrieval with metadata and relationship context"""
-        vec = embed_model.encode(query, convert_to_numpy=True)
-        D, I = index.search(np.array([vec]), k)
-        
-        retrieved_docs = []
-        for idx, score in zip(I[0], D[0]):
-            doc_content = texts[idx]
-            
-            # Create enhanced document with metadata if available
-            if metadata and idx < len(metadata):
-                meta = metadata[idx]
-                doc = SimpleNamespace(
-                    page_content=doc_content,
-                    metadata=meta,
-                    similarity_score=float(score),
-                    uri=meta.get('uri', ''),
-                    label=meta.get('label', ''),
-                    description=meta.get('description', '')
-                )
-            else:
-                doc = SimpleNamespace(
-                    page_content=doc_content,
-                    similarity_score=float(score)
-                )
-            
-            retrieved_docs.append(doc)
-        
-        return retrieved_docs
+        """Convenience wrapper for single-question REPL use"""
+        return retrieve_docs_batch([query], k)[0]
 
     def format_context_for_cypher(docs):
         """Format retrieved documents into context for Cypher generation"""
@@ -135,117 +240,154 @@ def main():
     def get_related_entities(query, docs):
         """Extract related entities and relationships for better context"""
         related_info = []
-        
+
         for doc in docs:
-            if hasattr(doc, 'uri') and doc.uri and not relationships_df.empty:
-                # Find relationships involving this entity
-                related_rels = relationships_df[
-                    (relationships_df['source'] == doc.uri) | 
-                    (relationships_df['target'] == doc.uri)
-                ]
-                
-                if not related_rels.empty:
-                    rel_summary = []
-                    for _, rel in related_rels.head(3).iterrows():  # Limit to 3 most relevant
-                        if rel['source'] == doc.uri:
-                            rel_summary.append(f"{doc.label or 'Entity'} --{rel['type']}--> {rel['target'].split('#')[-1]}")
-                        else:
-                            rel_summary.append(f"{rel['source'].split('#')[-1]} --{rel['type']}--> {doc.label or 'Entity'}")
-                    
-                    if rel_summary:
-                        related_info.append(f"Related to {doc.label or doc.uri}: {'; '.join(rel_summary)}")
-        
+            if hasattr(doc, 'uri') and doc.uri:
+                rel_summary = []
+                # Limit to 3 most relevant in each direction
+                for rel_type, target_short in rels_by_source.get(doc.uri, [])[:3]:
+                    rel_summary.append(f"{doc.label or 'Entity'} --{rel_type}--> {target_short}")
+                for rel_type, source_short in rels_by_target.get(doc.uri, [])[:3]:
+                    rel_summary.append(f"{source_short} --{rel_type}--> {doc.label or 'Entity'}")
+
+                if rel_summary:
+                    related_info.append(f"Related to {doc.label or doc.uri}: {'; '.join(rel_summary)}")
+
         return related_info
 
     print("🔍 Enhanced RAG CLI with Relationship Context (type 'exit' to quit)")
     print(f"📊 Loaded {len(texts)} enriched passages with relationship context")
-    if not relationships_df.empty:
-        print(f"🔗 {len(relationships_df)} relationships available for context")
+    if num_relationships:
+        print(f"🔗 {num_relationships} relationships available for context")
     print()
 
-    while True:
-        question = input("> ").strip()
-        if question.lower() in ("exit", "quit"):
-            break
+    # — Semantic Cypher cache: reuse generated queries for repeated/paraphrased questions —
+    cypher_cache_path = os.path.join(data_folder, "cypher_cache.pkl")
+    cache_entries = []  # (question, cypher) pairs, parallel to cache_index rows
+    if os.path.exists(cypher_cache_path):
+        with open(cypher_cache_path, "rb") as f:
+            cache_entries = pickle.load(f)
+    cache_index = faiss.IndexFlatIP(embed_model.get_sentence_embedding_dimension())
+    if cache_entries:
+        cached_vecs = embed_model.encode(
+            [q for q, _ in cache_entries],
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype(np.float32, copy=False)
+        cache_index.add(cached_vecs)
 
-        # 1) Enhanced retrieval
-        docs = retrieve_docs(question, k=5)
-        logging.info("Retrieved %d enriched passages", len(docs))
-        
-        # Format context for Cypher generation
-        context = format_context_for_cypher(docs)
+    cache_threshold = float(os.getenv("CYPHER_CACHE_SIM", 0.92))
+
+    # One long-lived session for the whole REPL — session churn dominates short Cypher calls
+    session = driver.session()
+
+    try:
+        while True:
+            question = input("> ").strip()
+            if question.lower() in ("exit", "quit"):
+                break
+
+            # 1) Enhanced retrieval
+            docs = retrieve_docs(question, k=5)
+            logging.info("Retrieved %d enriched passages", len(docs))
         
-        # Get additional relationship context
-        related_entities = get_related_entities(question, docs)
-        if related_entities:
-            context += "\n\nRelated Entities and Relationships:\n" + "\n".join(related_entities)
-
-        # Show retrieved context (optional - for debugging)
-        print(f"\n📋 Retrieved Context Summary:")
-        for i, doc in enumerate(docs[:3], 1):  # Show top 3
-            score = getattr(doc, 'similarity_score', 0)
-            label = getattr(doc, 'label', 'Unknown')
-            print(f"  {i}. {label} (similarity: {score:.3f})")
-            # Show first 100 chars of content
-            content_preview = doc.page_content[:100] + "..." if len(doc.page_content) > 100 else doc.page_content
-            print(f"     {content_preview}")
-        print()
-
-        # 2) Generate Cypher with enhanced context
-        cypher = generate_cypher(question, driver, context)
-
-        print(f"⟶ Generated Cypher:\n{cypher}\n")
-
-        # 3) Extract parameters (enhanced parameter extraction)
-        params = {}
+            # Format context for Cypher generation
+            context = format_context_for_cypher(docs)
         
-        # Existing parameter extraction
-        if "$name" in cypher:
-            m = re.search(r"'(.+?)'", question)
-            if m:
-                params["name"] = m.group(1)
+            # Get additional relationship context
+            related_entities = get_related_entities(question, docs)
+            if related_entities:
+                context += "\n\nRelated Entities and Relationships:\n" + "\n".join(related_entities)
+
+            # Show retrieved context (optional - for debugging)
+            print(f"\n📋 Retrieved Context Summary:")
+            for i, doc in enumerate(docs[:3], 1):  # Show top 3
+                score = getattr(doc, 'similarity_score', 0)
+                label = getattr(doc, 'label', 'Unknown')
+                print(f"  {i}. {label} (similarity: {score:.3f})")
+                # Show first 100 chars of content
+                content_preview = doc.page_content[:100] + "..." if len(doc.page_content) > 100 else doc.page_content
+                print(f"     {content_preview}")
+            print()
+
+            # 2) Generate Cypher with enhanced context, checking the semantic cache first
+            q_vec = embed_model.encode(
+                [question],
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            ).astype(np.float32, copy=False)
+
+            cypher = None
+            if cache_index.ntotal:
+                cache_D, cache_I = cache_index.search(q_vec, 1)
+                if cache_D[0][0] >= cache_threshold:
+                    cypher = cache_entries[cache_I[0][0]][1]
+                    logging.info("Cypher cache hit (similarity %.3f)", cache_D[0][0])
+
+            if cypher is None:
+                cypher = generate_cypher(question, driver, context)
+                cache_entries.append((question, cypher))
+                cache_index.add(q_vec)
+                with open(cypher_cache_path, "wb") as f:
+                    pickle.dump(cache_entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            print(f"⟶ Generated Cypher:\n{cypher}\n")
+
+            # 3) Extract parameters (enhanced parameter extraction)
+            params = {}
         
-        if "$license" in cypher:
-            m = re.search(r"license (?:is|=) '(.+?)'", question, re.IGNORECASE)
-            if m:
-                params["license"] = m.group(1)
+            # Existing parameter extraction
+            if "$name" in cypher:
+                m = NAME_RE.search(question)
+                if m:
+                    params["name"] = m.group(1)
+
+            if "$license" in cypher:
+                m = LICENSE_RE.search(question)
+                if m:
+                    params["license"] = m.group(1)
         
-        # Enhanced parameter extraction based on retrieved entities
-        for doc in docs:
-            if hasattr(doc, 'label') and doc.label:
-                # If the question mentions the label, it might be a parameter
-                if doc.label.lower() in question.lower():
-                    # This could be enhanced based on your specific use cases
-                    pass
-
-        # 4) Execute Cypher
-        try:
-            with driver.session() as session:
+            # Enhanced parameter extraction based on retrieved entities.
+            # Lowercase the question once and scan the labels in a single pass —
+            # the old loop re-lowercased the question for every doc. (At k=5 docs
+            # a multi-pattern automaton would cost more than it saves.)
+            question_lower = question.lower()
+            matched_labels = {
+                doc.label for doc in docs
+                if doc.label and doc.label.lower() in question_lower
+            }
+            if matched_labels:
+                # Labels mentioned in the question are candidate query parameters
+                logging.debug("Question mentions entity labels: %s", matched_labels)
+
+            # 4) Execute Cypher
+            try:
                 result = session.run(cypher, params)
                 records = list(result)
-        except neo4j_exceptions.ClientError as e:
-            print("❌ Cypher execution failed:", e)
-            print("   This might be due to schema differences or parameter issues.")
-            continue
-        except Exception as e:
-            print("❌ Unexpected error:", e)
-            continue
-
-        # 5) Enhanced result display
-        if not records:
-            print("No results found.\n")
-        else:
-            print("✅ Results:")
-            for i, rec in enumerate(records, 1):
-                if len(rec.values()) == 1:
-                    print(f"  {i}. {next(iter(rec.values()))}")
-                else:
-                    # Multiple columns - show all
-                    values = list(rec.values())
-                    print(f"  {i}. {' | '.join(str(v) for v in values)}")
-            print(f"\nFound {len(records)} result(s).\n")
+            except neo4j_exceptions.ClientError as e:
+                print("❌ Cypher execution failed:", e)
+                print("   This might be due to schema differences or parameter issues.")
+                continue
+            except Exception as e:
+                print("❌ Unexpected error:", e)
+                continue
 
-    driver.close()
+            # 5) Enhanced result display
+            if not records:
+                print("No results found.\n")
+            else:
+                print("✅ Results:")
+                for i, rec in enumerate(records, 1):
+                    if len(rec.values()) == 1:
+                        print(f"  {i}. {next(iter(rec.values()))}")
+                    else:
+                        # Multiple columns - show all
+                        values = list(rec.values())
+                        print(f"  {i}. {' | '.join(str(v) for v in values)}")
+                print(f"\nFound {len(records)} result(s).\n")
+    finally:
+        session.close()
+        driver.close()
     print("👋 Goodbye!")
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@
 
 import re
 import os
+import time
 from dotenv import load_dotenv
 import google.generativeai as genai
 from neo4j import GraphDatabase
@@ -45,38 +46,63 @@ few_shot_snippets = [
     }
 ]
 
+# Extraction patterns for the generated Cypher, tried in order of
+# specificity; compiled once instead of on every response
+_CYPHER_PATTERNS = tuple(
+    re.compile(p, re.DOTALL | re.IGNORECASE) for p in (
+        r'```cypher\s*(.*?)\s*```',
+        r'```\s*(MATCH.*?)\s*```',
+        r'(MATCH.*?)(?:\n|$)',
+        r'(CREATE.*?)(?:\n|$)',
+        r'(RETURN.*?)(?:\n|$)',
+    )
+)
+_WS_RE = re.compile(r'\s+')
+
+# Schema snapshots per driver, refreshed after SCHEMA_CACHE_TTL seconds —
+# the graph doesn't change mid-session, so every question shouldn't pay
+# for a full introspection round-trip
+SCHEMA_CACHE_TTL = 300
+_schema_cache = {}
+
 def introspect_schema(driver: GraphDatabase) -> str:
-    """Get detailed schema information from Neo4j"""
-    with driver.session() as session:
+    """Get detailed schema information from Neo4j (cached for a few minutes)"""
+    cached = _schema_cache.get(id(driver))
+    if cached is not None:
+        schema, fetched_at = cached
+        if time.monotonic() - fetched_at < SCHEMA_CACHE_TTL:
+            return schema
+
+    def _tx(tx):
         # Get node labels with counts
-        labels_result = session.run("CALL db.labels()")
-        labels = [record[0] for record in labels_result]
+        labels = [record[0] for record in tx.run("CALL db.labels()")]
 
-        # Get relationship types with counts  
-        rels_result = session.run("CALL db.relationshipTypes()")
-        relationships = [record[0] for record in rels_result]
+        # Get relationship types with counts
+        relationships = [record[0] for record in tx.run("CALL db.relationshipTypes()")]
 
         # Get property keys
-        props_result = session.run("CALL db.propertyKeys()")
-        properties = [record[0] for record in props_result]
+        properties = [record[0] for record in tx.run("CALL db.propertyKeys()")]
 
-        # Get sample nodes for each label to understand structure
+        # Get sample nodes for each label to understand structure. Literal
+        # label tokens keep these as NodeByLabelScan/count-store lookups
+        # (no full store scan), and sorting makes the sampled subset
+        # deterministic across runs.
         schema_details = []
-        for label in labels[:5]:  # Limit to first 5 labels
+        for label in sorted(labels)[:5]:  # Limit to first 5 labels
             try:
-                sample_result = session.run(f"MATCH (n:`{label}`) RETURN n LIMIT 3")
+                sample_result = tx.run(f"MATCH (n:`{label}`) RETURN n LIMIT 3")
                 samples = [dict(record["n"]) for record in sample_result]
-                
-                count_result = session.run(f"MATCH (n:`{label}`) RETURN count(n) as count")
+
+                count_result = tx.run(f"MATCH (n:`{label}`) RETURN count(n) as count")
                 count = count_result.single()["count"]
-                
+
                 schema_details.append(f"- {label} ({count} nodes)")
                 if samples:
                     sample_props = set()
                     for sample in samples:
                         sample_props.update(sample.keys())
                     schema_details.append(f"  Properties: {', '.join(sorted(sample_props))}")
-                    
+
             except Exception as e:
                 schema_details.append(f"- {label} (error: {e})")
 
@@ -84,9 +110,16 @@ def introspect_schema(driver: GraphDatabase) -> str:
         schema = "=== NODE LABELS ===\n" + "\n".join(schema_details)
         schema += "\n\n=== RELATIONSHIP TYPES ===\n" + "\n".join(f"- {rel}" for rel in relationships)
         schema += "\n\n=== PROPERTIES ===\n" + "\n".join(f"- {prop}" for prop in properties)
-        
         return schema
 
+    # One managed read transaction pipelines all the queries over a single
+    # connection (with driver-side retries) instead of autocommitting each
+    with driver.session() as session:
+        schema = session.execute_read(_tx)
+
+    _schema_cache[id(driver)] = (schema, time.monotonic())
+    return schema
+
 def generate_cypher(question: str, driver: GraphDatabase, context: str = "") -> str:
     """
     Generate a Cypher query based on the question and actual Neo4j schema.
@@ -131,24 +164,16 @@ Generate ONLY the Cypher query, no explanations:
         resp = gemini.generate_content(prompt).text
         
         # Extract the Cypher query - try multiple patterns
-        patterns = [
-            r'```cypher\s*(.*?)\s*```',
-            r'```\s*(MATCH.*?)\s*```',
-            r'(MATCH.*?)(?:\n|$)',
-            r'(CREATE.*?)(?:\n|$)',
-            r'(RETURN.*?)(?:\n|$)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, resp, re.DOTALL | re.IGNORECASE)
+        for pattern in _CYPHER_PATTERNS:
+            match = pattern.search(resp)
             if match:
                 cypher = match.group(1).strip()
                 # Clean up the query
-                cypher = re.sub(r'\s+', ' ', cypher)  # Normalize whitespace
+                cypher = _WS_RE.sub(' ', cypher)  # Normalize whitespace
                 return cypher
-        
+
         # If no pattern matches, return the response as-is (cleaned up)
-        cleaned_resp = re.sub(r'\s+', ' ', resp.strip())
+        cleaned_resp = _WS_RE.sub(' ', resp.strip())
         return cleaned_resp
         
     except Exception as e:
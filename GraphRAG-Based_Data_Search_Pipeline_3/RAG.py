@@ -2,63 +2,120 @@
 RAG.py: Convert RDF triples from Turtle into CSV files for Neo4j import.
 Enhanced version to process entire folders of TTL files.
 """
+import csv
 import rdflib
-import pandas as pd
 from rdflib.namespace import RDF
 import os
-import glob
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+# Optional fast path: pyoxigraph streams triples from its Rust parser without
+# materializing an rdflib Graph first. Falls back to rdflib when missing.
+try:
+    import pyoxigraph
+except ImportError:
+    pyoxigraph = None
+
+def _iter_triples(turtle_path: str):
+    """Yield (subject, predicate, object_uri) string triples from a TTL file.
+
+    object_uri is None when the object is a literal rather than a URI.
+    """
+    if pyoxigraph is not None:
+        # pyoxigraph >= 0.4 API: positional args mean serialized content, so
+        # the path and format must be passed by keyword
+        for triple in pyoxigraph.parse(path=turtle_path,
+                                       format=pyoxigraph.RdfFormat.TURTLE):
+            o = triple.object
+            yield (
+                triple.subject.value,
+                triple.predicate.value,
+                o.value if isinstance(o, pyoxigraph.NamedNode) else None,
+            )
+    else:
+        g = rdflib.Graph()
+        g.parse(turtle_path, format='turtle')
+        for s, p, o in g:
+            yield str(s), str(p), str(o) if isinstance(o, rdflib.URIRef) else None
+
+def _uri_suffix(uri: str) -> str:
+    """Local name of a URI: the part after '#', falling back to the last '/'."""
+    head, sep, tail = uri.rpartition('#')
+    if sep:
+        return tail
+    return uri.rpartition('/')[2]
+
 def extract_csv(turtle_path: str, node_csv: str, rel_csv: str):
     """Convert a single TTL file to node and relationship CSV files."""
-    g = rdflib.Graph()
-    g.parse(turtle_path, format='turtle')
-
+    # A seen set dedupes in the loop itself, so repeated URIs (subjects
+    # recur once per predicate) don't even pay for the suffix computation
+    seen = set()
     nodes = []
     edges = []
-    for s, p, o in g:
+    for s, p, o_uri in _iter_triples(turtle_path):
         # treat all subjects and objects as nodes
-        nodes.append((str(s), s.split('#')[-1]))
-        if isinstance(o, rdflib.URIRef):
-            nodes.append((str(o), o.split('#')[-1]))
-            edges.append((str(s), p.split('#')[-1], str(o)))
+        # (rpartition avoids building a list per URI the way split does)
+        if s not in seen:
+            seen.add(s)
+            nodes.append((s, _uri_suffix(s)))
+        if o_uri is not None:
+            if o_uri not in seen:
+                seen.add(o_uri)
+                nodes.append((o_uri, _uri_suffix(o_uri)))
+            edges.append((s, _uri_suffix(p), o_uri))
 
-    nodes_df = pd.DataFrame(nodes, columns=['id', 'label']).drop_duplicates()
-    edges_df = pd.DataFrame(edges, columns=['source', 'type', 'target'])
+    with open(node_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'label'])
+        writer.writerows(nodes)
 
-    nodes_df.to_csv(node_csv, index=False)
-    edges_df.to_csv(rel_csv, index=False)
+    with open(rel_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['source', 'type', 'target'])
+        writer.writerows(edges)
+
+def _convert_one(args) -> str:
+    """Convert one TTL file (module-level so it pickles for worker processes)."""
+    ttl_file, nodes_csv, rels_csv = args
+    extract_csv(ttl_file, nodes_csv, rels_csv)
+    return ttl_file
 
 def process_folder(input_folder: str, output_folder: str):
     """Process all TTL files in input folder and create CSV files in output folder."""
     # Create output directory if it doesn't exist
     Path(output_folder).mkdir(parents=True, exist_ok=True)
-    
-    # Find all TTL files in the input folder
-    ttl_pattern = os.path.join(input_folder, "*.ttl")
-    ttl_files = glob.glob(ttl_pattern)
-    
+
+    # Find all TTL files in the input folder (scandir gives paths directly)
+    ttl_files = [e.path for e in os.scandir(input_folder) if e.name.endswith(".ttl")]
+
     if not ttl_files:
         print(f"No TTL files found in {input_folder}")
         return
-    
+
     print(f"Found {len(ttl_files)} TTL files to process")
-    
+
+    jobs = []
     for ttl_file in ttl_files:
         # Get the base filename without extension
         base_name = Path(ttl_file).stem
-        
-        # Create output CSV filenames
-        nodes_csv = os.path.join(output_folder, f"{base_name}_nodes.csv")
-        rels_csv = os.path.join(output_folder, f"{base_name}_rels.csv")
-        
-        try:
-            print(f"Processing: {ttl_file}")
-            extract_csv(ttl_file, nodes_csv, rels_csv)
-            print(f"  -> Created: {nodes_csv}")
-            print(f"  -> Created: {rels_csv}")
-        except Exception as e:
-            print(f"Error processing {ttl_file}: {str(e)}")
+        jobs.append((
+            ttl_file,
+            os.path.join(output_folder, f"{base_name}_nodes.csv"),
+            os.path.join(output_folder, f"{base_name}_rels.csv"),
+        ))
+
+    # Turtle parsing is CPU-bound, so convert files across worker processes
+    with ProcessPoolExecutor() as ex:
+        for (ttl_file, nodes_csv, rels_csv), future in [
+            (job, ex.submit(_convert_one, job)) for job in jobs
+        ]:
+            try:
+                future.result()
+                print(f"Processed: {ttl_file}")
+                print(f"  -> Created: {nodes_csv}")
+                print(f"  -> Created: {rels_csv}")
+            except Exception as e:
+                print(f"Error processing {ttl_file}: {str(e)}")
 
 if __name__ == '__main__':
     import argparse
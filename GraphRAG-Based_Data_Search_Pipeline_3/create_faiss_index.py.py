@@ -5,11 +5,13 @@ Creates FAISS index with metadata and relationship context
 """
 
 import os
-import pickle
 import logging
+from collections import defaultdict
 import faiss
+import orjson
 import numpy as np
 import pandas as pd
+import torch
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 from langchain_community.embeddings import HuggingFaceEmbeddings
@@ -26,10 +28,17 @@ def create_enhanced_index():
     
     driver = GraphDatabase.driver(uri, auth=(user, password))
     
-    # Setup embedding model
+    # Setup embedding model — same device/fp16 handling as KG_RAG
     print("🔧 Loading embedding model...")
-    hf = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    device = os.getenv("EMBED_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+    hf = HuggingFaceEmbeddings(
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        model_kwargs={"device": device}
+    )
     embed_model = hf.client
+    if device == "cuda":
+        # fp16 halves VRAM and roughly doubles encode throughput; lossless for MiniLM retrieval
+        embed_model.half()
     
     # Create data folder
     project_root = os.path.dirname(os.path.abspath(__file__))
@@ -38,39 +47,14 @@ def create_enhanced_index():
     
     print("📊 Extracting data from Neo4j...")
     
-    with driver.session() as session:
-        # Get all nodes with their properties
-        node_query = """
-        MATCH (n)
-        RETURN 
-            id(n) as node_id,
-            labels(n) as labels,
-            properties(n) as props,
-            n.uri as uri,
-            n.name as name,
-            n.description as description
-        """
-        
-        nodes_result = session.run(node_query)
-        nodes_data = []
-        
-        for record in nodes_result:
-            node_info = {
-                'node_id': record['node_id'],
-                'labels': record['labels'],
-                'props': dict(record['props']) if record['props'] else {},
-                'uri': record['uri'],
-                'name': record['name'],
-                'description': record['description']
-            }
-            nodes_data.append(node_info)
-        
-        print(f"   Retrieved {len(nodes_data)} nodes")
-        
-        # Get all relationships
+    # fetch_size keeps the driver's prefetch buffer bounded while we stream
+    with driver.session(fetch_size=10000) as session:
+        # First pass: stream relationships straight into the adjacency dicts.
+        # The row dicts are shared by reference with relationships_data (kept
+        # only because it's saved as an artifact below), so nothing is copied.
         rel_query = """
         MATCH (a)-[r]->(b)
-        RETURN 
+        RETURN
             a.uri as source,
             type(r) as relationship_type,
             b.uri as target,
@@ -78,11 +62,12 @@ def create_enhanced_index():
             a.name as source_name,
             b.name as target_name
         """
-        
-        rels_result = session.run(rel_query)
+
+        out_rels = defaultdict(list)
+        in_rels = defaultdict(list)
         relationships_data = []
-        
-        for record in rels_result:
+
+        for record in session.run(rel_query):
             rel_info = {
                 'source': record['source'],
                 'type': record['relationship_type'],
@@ -92,86 +77,140 @@ def create_enhanced_index():
                 'properties': dict(record['rel_props']) if record['rel_props'] else {}
             }
             relationships_data.append(rel_info)
-        
+            out_rels[rel_info['source']].append(rel_info)
+            in_rels[rel_info['target']].append(rel_info)
+
         print(f"   Retrieved {len(relationships_data)} relationships")
-    
-    driver.close()
-    
-    # Create enriched passages for embedding
-    print("🔤 Creating enriched text passages...")
-    
-    passages = []
-    metadata = []
-    
-    for node in nodes_data:
-        # Create rich text representation of each node
-        text_parts = []
-        
-        # Basic info
-        if node['name']:
-            text_parts.append(f"Name: {node['name']}")
-        
-        if node['labels']:
-            text_parts.append(f"Type: {', '.join(node['labels'])}")
-        
-        if node['description']:
-            text_parts.append(f"Description: {node['description']}")
-        
-        # Add other properties
-        for key, value in node['props'].items():
-            if key not in ['name', 'description', 'uri'] and value:
-                text_parts.append(f"{key}: {value}")
-        
-        # Add relationship context
-        related_info = []
-        for rel in relationships_data:
-            if rel['source'] == node['uri']:
+
+        # Second pass: stream nodes and emit passage + metadata per record,
+        # never materializing a nodes_data list in between
+        print("🔤 Creating enriched text passages...")
+
+        node_query = """
+        MATCH (n)
+        RETURN
+            id(n) as node_id,
+            labels(n) as labels,
+            properties(n) as props,
+            n.uri as uri,
+            n.name as name,
+            n.description as description
+        """
+
+        passages = []
+        metadata = []
+
+        for record in session.run(node_query):
+            uri = record['uri']
+            name = record['name']
+            labels = record['labels']
+            description = record['description']
+            props = dict(record['props']) if record['props'] else {}
+
+            # Create rich text representation of each node as one (field,
+            # value) list and a single join — falsy values are filtered in
+            # the generator instead of per-field branches building strings
+            labels_str = ", ".join(labels) if labels else ""
+            parts = [
+                ("Name", name),
+                ("Type", labels_str),
+                ("Description", description),
+            ]
+
+            # Add other properties
+            for key, value in props.items():
+                if key not in ('name', 'description', 'uri'):
+                    parts.append((key, value))
+
+            # Add relationship context — stop at 5 instead of formatting a hub
+            # node's full edge list and slicing afterwards
+            related_info = []
+            for rel in out_rels.get(uri, ()):
                 target_name = rel['target_name'] or rel['target'].split('#')[-1]
                 related_info.append(f"has {rel['type']} {target_name}")
-            elif rel['target'] == node['uri']:
-                source_name = rel['source_name'] or rel['source'].split('#')[-1]
-                related_info.append(f"is {rel['type']} of {source_name}")
-        
-        if related_info:
-            text_parts.append(f"Relationships: {'; '.join(related_info[:5])}")  # Limit to 5 relationships
-        
-        # Create final passage
-        passage = ". ".join(text_parts)
-        passages.append(passage)
-        
-        # Store metadata
-        meta = {
-            'node_id': node['node_id'],
-            'uri': node['uri'],
-            'label': node['name'] or (node['labels'][0] if node['labels'] else 'Unknown'),
-            'labels': node['labels'],
-            'description': node['description'],
-            'properties': node['props']
-        }
-        metadata.append(meta)
-    
+                if len(related_info) >= 5:
+                    break
+            if len(related_info) < 5:
+                for rel in in_rels.get(uri, ()):
+                    source_name = rel['source_name'] or rel['source'].split('#')[-1]
+                    related_info.append(f"is {rel['type']} of {source_name}")
+                    if len(related_info) >= 5:
+                        break
+
+            if related_info:
+                parts.append(("Relationships", "; ".join(related_info)))  # Limited to 5 relationships
+
+            # Create final passage
+            passages.append(". ".join(f"{k}: {v}" for k, v in parts if v))
+
+            # Store metadata
+            metadata.append({
+                'node_id': record['node_id'],
+                'uri': uri,
+                'label': name or (labels[0] if labels else 'Unknown'),
+                'labels': labels,
+                'description': description,
+                'properties': props
+            })
+
+    driver.close()
+
     print(f"   Created {len(passages)} enriched passages")
     
     # Create embeddings
     print("🧮 Computing embeddings...")
-    embeddings = []
-    batch_size = 32
-    
-    for i in range(0, len(passages), batch_size):
-        batch = passages[i:i + batch_size]
-        batch_embeddings = embed_model.encode(batch, convert_to_numpy=True)
-        embeddings.extend(batch_embeddings)
-        print(f"   Processed {min(i + batch_size, len(passages))}/{len(passages)} passages")
-    
-    embeddings = np.array(embeddings)
+
+    # Preallocate the full matrix once and scatter each encoded slice straight
+    # into passage order — no full-size sorted intermediate plus un-permute copy,
+    # which halves peak memory during the build
+    dim = embed_model.get_sentence_embedding_dimension()
+    embeddings = np.empty((len(passages), dim), dtype=np.float32)
+
+    # Sort passages by length so each encoder batch pads to a similar
+    # sequence length (no wasted compute on padding tokens)
+    order = np.argsort([len(p) for p in passages])
+    ENCODE_SLICE = 8192
+    for i in range(0, len(order), ENCODE_SLICE):
+        idx = order[i:i + ENCODE_SLICE]
+        embeddings[idx] = embed_model.encode(
+            [passages[j] for j in idx],
+            batch_size=128,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        print(f"   Encoded {min(i + ENCODE_SLICE, len(order))}/{len(order)} passages...")
     
     # Create FAISS index
     print("🗂️ Building FAISS index...")
     dimension = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity
-    
-    # Normalize embeddings for cosine similarity
-    faiss.normalize_L2(embeddings)
+
+    # Rows are already unit-length (normalize_embeddings=True above), so the
+    # inner-product index works in cosine space with no extra pass
+    num_vectors = len(embeddings)
+    if num_vectors < 5000:
+        # 8-bit scalar quantization: 4x smaller codes than FP32 flat with
+        # negligible recall loss on MiniLM vectors, and the exhaustive scan
+        # moves 4x fewer bytes per query
+        index = faiss.IndexScalarQuantizer(
+            dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+    else:
+        # nlist grows with 4*sqrt(N), capped so every centroid still sees
+        # the ~39 training vectors faiss wants per cluster
+        nlist = max(1, min(int(4 * num_vectors ** 0.5), num_vectors // 39))
+        if num_vectors < 100000:
+            # 4-bit PQ FastScan path (SIMD kernels) for mid-size corpora
+            index = faiss.index_factory(
+                dimension, f"IVF{nlist},PQ16x4fsr", faiss.METRIC_INNER_PRODUCT)
+        else:
+            # OPQ rotation + IVF-PQ compresses the index ~50x at large scale
+            index = faiss.index_factory(
+                dimension, f"OPQ16,IVF{nlist},PQ16", faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+        # Scan 16 cells per query — a solid recall/latency default
+        faiss.extract_index_ivf(index).nprobe = 16
+
     index.add(embeddings)
     
     print(f"   Index created with {index.ntotal} vectors")
@@ -183,21 +222,26 @@ def create_enhanced_index():
     faiss_path = os.path.join(data_folder, "passages.index")
     faiss.write_index(index, faiss_path)
     
-    # Save passages
-    passages_path = os.path.join(data_folder, "passages.pkl")
-    with open(passages_path, "wb") as f:
-        pickle.dump(passages, f)
-    
-    # Save metadata
-    metadata_path = os.path.join(data_folder, "metadata.pkl")
+    # Save passages in an mmap-friendly layout (raw UTF-8 blob + int64 offsets)
+    # so the RAG CLI can decode just the k retrieved strings per query
+    encoded = [p.encode("utf-8") for p in passages]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with open(os.path.join(data_folder, "text_data.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(data_folder, "offsets.npy"), offsets)
+
+    # Save metadata as JSON via orjson — no pickle, loads fast, readable from
+    # any downstream tool
+    metadata_path = os.path.join(data_folder, "metadata.json")
     with open(metadata_path, "wb") as f:
-        pickle.dump(metadata, f)
-    
-    # Save relationships as DataFrame
+        f.write(orjson.dumps(metadata, option=orjson.OPT_SERIALIZE_NUMPY))
+
+    # Save relationships as zstd-compressed Parquet (columnar, smaller and
+    # faster to read than pickled pandas)
     relationships_df = pd.DataFrame(relationships_data)
-    relationships_path = os.path.join(data_folder, "relationships.pkl")
-    with open(relationships_path, "wb") as f:
-        pickle.dump(relationships_df, f)
+    relationships_path = os.path.join(data_folder, "relationships.parquet")
+    relationships_df.to_parquet(relationships_path, compression="zstd")
     
     print("✅ Enhanced FAISS index created successfully!")
     print(f"   📁 Files saved in: {data_folder}")
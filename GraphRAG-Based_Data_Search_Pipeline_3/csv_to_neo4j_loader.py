@@ -2,17 +2,23 @@
 
 import os
 import glob
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 from urllib.parse import urlparse
 import re
 
+# The same handful of URIs repeats across thousands of rows, so memoizing
+# turns the repeated str()/split work into a dict lookup after first compute
+@functools.lru_cache(maxsize=200_000)
 def clean_label(uri_or_label):
     """Extract clean label from URI or return cleaned label"""
-    if pd.isna(uri_or_label):
+    # None/NaN check without the pd.isna call overhead (NaN != NaN)
+    if uri_or_label is None or uri_or_label != uri_or_label:
         return ""
-    
+
     uri_str = str(uri_or_label)
     
     # If it's a URI, extract the fragment or last part
@@ -27,21 +33,65 @@ def clean_label(uri_or_label):
     # If it's already a clean label, return as is
     return uri_str
 
-def get_node_label_from_relationships(node_uri, rels_df):
-    """Determine node label based on 'type' relationships"""
-    # Find relationships where this node is the source and relationship type is 'type'
-    type_rels = rels_df[
-        (rels_df['source'] == node_uri) & 
-        (rels_df['type'] == 'type')
-    ]
-    
-    if not type_rels.empty:
-        # Get the target of the type relationship
-        target = type_rels.iloc[0]['target']
-        return clean_label(target)
-    
-    # Default fallback
-    return "Entity"
+def build_uri_to_label(rels_df):
+    """Map each node URI to its label from the 'type' relationships.
+
+    One pass over the filtered rows replaces a full-DataFrame scan per node;
+    the first 'type' relationship wins, matching the old iloc[0] behavior.
+    """
+    uri_to_label = {}
+    type_rels = rels_df[rels_df['type'] == 'type']
+    for source, target in zip(type_rels['source'], type_rels['target']):
+        if source not in uri_to_label:
+            uri_to_label[source] = clean_label(target)
+    return uri_to_label
+
+# Rows per UNWIND batch — one round-trip and one transaction per chunk
+BATCH_SIZE = 5000
+
+# Concurrent write transactions for the node phase — node CREATEs touch
+# distinct URIs, so the batches never conflict and throughput scales with
+# the number of parallel sessions
+NODE_WRITE_WORKERS = 8
+
+def _write_node_chunk(driver, label, chunk):
+    # One session per task so each worker gets its own bolt connection
+    with driver.session() as session:
+        session.execute_write(_create_node_batch, label, chunk)
+    return len(chunk)
+
+def _apoc_available(driver):
+    """True when the APOC procedures are installed on the server."""
+    try:
+        with driver.session() as session:
+            session.run("RETURN apoc.version()").consume()
+        return True
+    except Exception:
+        return False
+
+def _create_node_batch(tx, label, rows):
+    # Every node also gets the shared :Node label so one uri index covers
+    # the whole graph regardless of its type-specific label
+    tx.run(f"""
+    UNWIND $rows AS row
+    CREATE (n:`{label}`:Node {{
+        uri: row.uri,
+        label: row.label,
+        name: row.name
+    }})
+    """, rows=rows)
+
+def _create_rel_batch(tx, rel_type, rows):
+    # :Node lets the planner use the uri index — an O(1) lookup per MATCH
+    # instead of a full store scan per relationship
+    result = tx.run(f"""
+    UNWIND $rows AS row
+    MATCH (source:Node {{uri: row.source_uri}})
+    MATCH (target:Node {{uri: row.target_uri}})
+    CREATE (source)-[r:`{rel_type}`]->(target)
+    SET r.original_type = row.original_type
+    """, rows=rows)
+    return result.consume().counters.relationships_created
 
 def load_csv_to_neo4j():
     """Load CSV data into Neo4j database"""
@@ -52,8 +102,10 @@ def load_csv_to_neo4j():
     user = os.getenv("NEO4J_USER", "neo4j")
     password = os.getenv("NEO4J_PASSWORD", "YidanThesis")
     
-    driver = GraphDatabase.driver(uri, auth=(user, password))
-    
+    # Pool sized for the parallel node writers plus a couple of spare connections
+    driver = GraphDatabase.driver(uri, auth=(user, password),
+                                  max_connection_pool_size=16)
+
     # File paths
     file_root = os.path.dirname(os.path.abspath(__file__))
     csv_dir = os.path.join(file_root, "ttl_outputs_enrichment_scraped_csv")
@@ -80,109 +132,159 @@ def load_csv_to_neo4j():
     
     # Create nodes with proper labels
     print("📝 Creating nodes...")
-    
-    with driver.session() as session:
-        node_count = 0
-        
-        for _, node in all_nodes.iterrows():
-            node_uri = node['id']
-            node_label_text = node['label']
-            
-            # Determine the Neo4j label for this node based on its type relationships
-            neo4j_label = get_node_label_from_relationships(node_uri, all_rels)
-            
-            # Clean the label text for the name property
-            clean_name = clean_label(node_label_text)
-            
-            # Create the node
-            cypher = f"""
-            CREATE (n:`{neo4j_label}` {{
-                uri: $uri,
-                label: $label,
-                name: $name
-            }})
-            """
-            
-            try:
-                session.run(cypher, {
-                    'uri': node_uri,
-                    'label': node_label_text,
-                    'name': clean_name
-                })
-                node_count += 1
-                
-                if node_count % 50 == 0:
+
+    # Built once up front — O(R) instead of O(N*R) scanning per node
+    uri_to_label = build_uri_to_label(all_rels)
+
+    # Group rows by Neo4j label so each group can be written with a single
+    # UNWIND statement (labels can't be parameterized in Cypher)
+    # itertuples yields plain tuples — no per-row Series boxing like iterrows
+    nodes_by_label = {}
+    for node_uri, node_label_text in all_nodes[['id', 'label']].itertuples(index=False, name=None):
+        # Determine the Neo4j label for this node based on its type relationships
+        neo4j_label = uri_to_label.get(node_uri, "Entity")
+
+        # Clean the label text for the name property
+        clean_name = clean_label(node_label_text)
+
+        nodes_by_label.setdefault(neo4j_label, []).append({
+            'uri': node_uri,
+            'label': node_label_text,
+            'name': clean_name
+        })
+
+    use_apoc = _apoc_available(driver)
+    if use_apoc:
+        print("   APOC detected — batching server-side via apoc.periodic.iterate")
+
+    node_count = 0
+    if use_apoc:
+        # One call per label; the server chunks and parallelizes the writes
+        # internally, with no Python round-trip per batch
+        with driver.session() as session:
+            for neo4j_label, rows in nodes_by_label.items():
+                try:
+                    result = session.run(f"""
+                    CALL apoc.periodic.iterate(
+                        'UNWIND $rows AS row RETURN row',
+                        'CREATE (n:`{neo4j_label}`:Node {{uri: row.uri, label: row.label, name: row.name}})',
+                        {{batchSize: 10000, parallel: true, concurrency: 8, params: {{rows: $rows}}}})
+                    YIELD committedOperations
+                    RETURN committedOperations
+                    """, rows=rows)
+                    node_count += result.single()["committedOperations"]
                     print(f"   Created {node_count} nodes...")
-                    
-            except Exception as e:
-                print(f"   ⚠️  Error creating node {node_uri}: {e}")
-        
-        print(f"✅ Created {node_count} nodes")
-    
+                except Exception as e:
+                    print(f"   ⚠️  Error creating {neo4j_label} node batch: {e}")
+    else:
+        # Fan the per-label chunks out over parallel write transactions; the
+        # batches create disjoint nodes, so there are no write-write conflicts
+        with ThreadPoolExecutor(max_workers=NODE_WRITE_WORKERS) as executor:
+            futures = {}
+            for neo4j_label, rows in nodes_by_label.items():
+                for i in range(0, len(rows), BATCH_SIZE):
+                    chunk = rows[i:i + BATCH_SIZE]
+                    futures[executor.submit(_write_node_chunk, driver, neo4j_label, chunk)] = neo4j_label
+            for future in as_completed(futures):
+                try:
+                    node_count += future.result()
+                    print(f"   Created {node_count} nodes...")
+                except Exception as e:
+                    print(f"   ⚠️  Error creating {futures[future]} node batch: {e}")
+
+    print(f"✅ Created {node_count} nodes")
+
+    # Index uri before the relationship phase so every endpoint MATCH is an
+    # index seek instead of a full node scan
+    print("🗂️ Creating uri index...")
+    with driver.session() as session:
+        session.run("CREATE INDEX node_uri IF NOT EXISTS FOR (n:Node) ON (n.uri)")
+        session.run("CALL db.awaitIndexes()")
+
     # Create relationships
     print("🔗 Creating relationships...")
-    
-    with driver.session() as session:
-        rel_count = 0
-        
-        for _, rel in all_rels.iterrows():
-            source_uri = rel['source']
-            target_uri = rel['target']
-            rel_type = clean_label(rel['type'])
-            
-            # Skip 'type' relationships as we used them for node labels
-            if rel['type'] == 'type':
-                continue
-            
-            # Clean relationship type name (Neo4j doesn't like some characters)
-            rel_type_clean = re.sub(r'[^a-zA-Z0-9_]', '_', rel_type)
-            
-            cypher = f"""
-            MATCH (source {{uri: $source_uri}})
-            MATCH (target {{uri: $target_uri}})
-            CREATE (source)-[r:`{rel_type_clean}`]->(target)
-            SET r.original_type = $original_type
-            """
-            
-            try:
-                result = session.run(cypher, {
-                    'source_uri': source_uri,
-                    'target_uri': target_uri,
-                    'original_type': rel['type']
-                })
-                
-                if result.consume().counters.relationships_created > 0:
-                    rel_count += 1
-                
-                if rel_count % 50 == 0:
+
+    # Sanitize each distinct type once (Neo4j doesn't like some characters)
+    # instead of re-running the regex on every row
+    type_map = {t: re.sub(r'[^a-zA-Z0-9_]', '_', clean_label(t))
+                for t in all_rels['type'].unique()}
+
+    # Same batching idea, grouped by (sanitized) relationship type
+    rels_by_type = {}
+    for rel_source, rel_type, rel_target in all_rels[['source', 'type', 'target']].itertuples(index=False, name=None):
+        # Skip 'type' relationships as we used them for node labels
+        if rel_type == 'type':
+            continue
+
+        rel_type_clean = type_map[rel_type]
+
+        rels_by_type.setdefault(rel_type_clean, []).append({
+            'source_uri': rel_source,
+            'target_uri': rel_target,
+            'original_type': rel_type
+        })
+
+    rel_count = 0
+    if use_apoc:
+        # parallel:false — concurrent rel CREATEs lock both endpoint nodes
+        # and would deadlock on shared hubs; server-side batching still cuts
+        # the round-trips to one per type
+        with driver.session() as session:
+            for rel_type_clean, rows in rels_by_type.items():
+                try:
+                    result = session.run(f"""
+                    CALL apoc.periodic.iterate(
+                        'UNWIND $rows AS row RETURN row',
+                        'MATCH (source:Node {{uri: row.source_uri}}) MATCH (target:Node {{uri: row.target_uri}}) CREATE (source)-[r:`{rel_type_clean}`]->(target) SET r.original_type = row.original_type',
+                        {{batchSize: 10000, parallel: false, params: {{rows: $rows}}}})
+                    YIELD committedOperations
+                    RETURN committedOperations
+                    """, rows=rows)
+                    rel_count += result.single()["committedOperations"]
                     print(f"   Created {rel_count} relationships...")
-                    
-            except Exception as e:
-                print(f"   ⚠️  Error creating relationship {source_uri} -> {target_uri}: {e}")
-        
-        print(f"✅ Created {rel_count} relationships")
+                except Exception as e:
+                    print(f"   ⚠️  Error creating {rel_type_clean} relationship batch: {e}")
+    else:
+        with driver.session() as session:
+            for rel_type_clean, rows in rels_by_type.items():
+                for i in range(0, len(rows), BATCH_SIZE):
+                    chunk = rows[i:i + BATCH_SIZE]
+                    try:
+                        rel_count += session.execute_write(_create_rel_batch, rel_type_clean, chunk)
+                        print(f"   Created {rel_count} relationships...")
+                    except Exception as e:
+                        print(f"   ⚠️  Error creating {rel_type_clean} relationship batch: {e}")
+
+    print(f"✅ Created {rel_count} relationships")
     
-    # Verify the load
+    # Verify the load — aggregate counts in at most two round-trips instead
+    # of one query per label and per relationship type
     print("\n📊 Verifying loaded data...")
     with driver.session() as session:
-        # Count nodes by label
-        labels_result = session.run("CALL db.labels()")
-        labels = [record[0] for record in labels_result]
-        
+        if use_apoc:
+            # apoc.meta.stats returns both count maps in a single call
+            record = session.run(
+                "CALL apoc.meta.stats() YIELD labels, relTypesCount "
+                "RETURN labels, relTypesCount"
+            ).single()
+            label_counts = record["labels"]
+            rel_type_counts = record["relTypesCount"]
+        else:
+            label_counts = {
+                record["l"]: record["c"] for record in session.run(
+                    "MATCH (n) UNWIND labels(n) AS l RETURN l, count(*) AS c")
+            }
+            rel_type_counts = {
+                record["t"]: record["c"] for record in session.run(
+                    "MATCH ()-[r]->() RETURN type(r) AS t, count(*) AS c")
+            }
+
         print("   Node labels and counts:")
-        for label in labels:
-            count_result = session.run(f"MATCH (n:`{label}`) RETURN count(n) as count")
-            count = count_result.single()["count"]
+        for label, count in sorted(label_counts.items()):
             print(f"     {label}: {count} nodes")
-        
-        # Count relationships
-        rel_types_result = session.run("CALL db.relationshipTypes()")
-        rel_types = [record[0] for record in rel_types_result]
-        
+
         print("   Relationship types and counts:")
-        for rel_type in rel_types[:10]:  # Show first 10
-            count_result = session.run(f"MATCH ()-[r:`{rel_type}`]->() RETURN count(r) as count")
-            count = count_result.single()["count"]
+        for rel_type, count in sorted(rel_type_counts.items())[:10]:  # Show first 10
             print(f"     {rel_type}: {count} relationships")
     
     driver.close()
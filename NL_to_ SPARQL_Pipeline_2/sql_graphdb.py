@@ -1,12 +1,15 @@
 import re
 import os
-import requests
+import httpx
 from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 import google.generativeai as genai
 
 load_dotenv()
 
+# Compiled once — extracting the ```sparql fenced block happens on every question
+_SPARQL_RE = re.compile(r"```sparql(.*?)```", re.DOTALL)
+
 class Config:
     GRAPHDB_ENDPOINT = "http://wangyidans-MacBook-Pro.local:7200/repositories/Thesis"
     GEMINI_API_KEY = "your_api_key_here"  # Replace with your actual API key
@@ -25,8 +28,41 @@ gemini = genai.GenerativeModel(Config.GEMINI_MODEL_NAME)
 
 
 class OntoDMQuerySystem:
+    # One shared client for all instances: keeps the GraphDB connection
+    # alive across queries and negotiates HTTP/2 when the server supports it
+    _client = httpx.Client(http2=True, timeout=15)
+
     def __init__(self):
-        self.session = requests.Session()
+        # Cache generated queries by normalized question so repeated or
+        # re-phrased-only-by-case/whitespace questions skip the Gemini call
+        self._sparql_cache: Dict[str, str] = {}
+        # The instructions/schema block never changes, so render it once here
+        # instead of re-interpolating it for every question
+        self._prompt_head = f"""You are an expert SPARQL query assistant.
+        PREFIX ontodm: <https://purl.org/ontodm#>
+        {self.get_schema_context()}
+
+
+        Convert the following natural language question into a SPARQL query targeting the named graph <http://example.org/graph/enrichmentwithexamples>.
+        Rules:
+        1. Always include relevant PREFIX declarations at the top (e.g., ontodm, dc, dcterms).
+        2. Use only FROM <http://example.org/graph/enrichmentwithexamples> — do not use GRAPH {{}} blocks.
+        3. Place the FROM clause immediately after the SELECT clause and before the WHERE block.
+        4. Use rdf:type (or a) to filter by class when accessing properties (e.g., ?x a ontodm:Feature before ontodm:hasDataType).
+        5. Chain properties using semicolons when they share the same subject (e.g.,?s a ontodm:Dataset ; ontodm:hasName ?name ; dc:license ?license .).
+        6. Use FILTER(CONTAINS(LCASE(STR(?var)), "keyword")) when matching dataset or domain names, especially partial or lowercase values.
+        7. Avoid mixing FROM and GRAPH — only use FROM.
+        8. Use COUNT, GROUP BY, and ORDER BY properly when aggregating results.
+        9. When the question refers to a dataset using a partial or informal name (e.g., “Spotify”, “Bank”, “Cancer”), expand it using a predefined mapping (e.g., "Spotify" → "200K+ Spotify Songs Light Dataset").
+        10.Follow the structure and formatting style of the examples provided, including spacing, indentation, and use of OPTIONAL and FILTER clauses.
+        11.For tasks or features, use appropriate class filtering (ontodm:Task, ontodm:Feature, etc.) and include descriptions or purposes if mentioned.
+        12.Prioritize clarity and consistency with the queries used in folders like ttl_outputs_enrichment_prompts_with_examples and ttl_outputs_enrichment_scraped.
+        16. For “How does X support Y?” questions:\n"
+    "    • Anchor Y by its full IRI (no name FILTER).\n"
+    "    • Use ontodm:is_specified_input_of ex:Y (one-way).\n"
+    "    • Do NOT use ontodm:hasTask (it does not exist).",
+
+"""
 
     def get_schema_context(self) -> str:
         return """
@@ -51,31 +87,13 @@ Common Path Patterns:
 """
 
     def generate_sparql(self, question: str) -> str:
-        prompt = f"""You are an expert SPARQL query assistant.
-        PREFIX ontodm: <https://purl.org/ontodm#>
-        {self.get_schema_context()}
-
-       
-        Convert the following natural language question into a SPARQL query targeting the named graph <http://example.org/graph/enrichmentwithexamples>.
-        Rules:
-        1. Always include relevant PREFIX declarations at the top (e.g., ontodm, dc, dcterms).
-        2. Use only FROM <http://example.org/graph/enrichmentwithexamples> — do not use GRAPH {{}} blocks.
-        3. Place the FROM clause immediately after the SELECT clause and before the WHERE block.
-        4. Use rdf:type (or a) to filter by class when accessing properties (e.g., ?x a ontodm:Feature before ontodm:hasDataType).
-        5. Chain properties using semicolons when they share the same subject (e.g.,?s a ontodm:Dataset ; ontodm:hasName ?name ; dc:license ?license .).
-        6. Use FILTER(CONTAINS(LCASE(STR(?var)), "keyword")) when matching dataset or domain names, especially partial or lowercase values.
-        7. Avoid mixing FROM and GRAPH — only use FROM.
-        8. Use COUNT, GROUP BY, and ORDER BY properly when aggregating results.
-        9. When the question refers to a dataset using a partial or informal name (e.g., “Spotify”, “Bank”, “Cancer”), expand it using a predefined mapping (e.g., "Spotify" → "200K+ Spotify Songs Light Dataset").
-        10.Follow the structure and formatting style of the examples provided, including spacing, indentation, and use of OPTIONAL and FILTER clauses.
-        11.For tasks or features, use appropriate class filtering (ontodm:Task, ontodm:Feature, etc.) and include descriptions or purposes if mentioned.
-        12.Prioritize clarity and consistency with the queries used in folders like ttl_outputs_enrichment_prompts_with_examples and ttl_outputs_enrichment_scraped.
-        16. For “How does X support Y?” questions:\n"
-    "    • Anchor Y by its full IRI (no name FILTER).\n"
-    "    • Use ontodm:is_specified_input_of ex:Y (one-way).\n"
-    "    • Do NOT use ontodm:hasTask (it does not exist).",
+        cache_key = " ".join(question.lower().split())
+        cached = self._sparql_cache.get(cache_key)
+        if cached is not None:
+            print("♻️ Reusing cached SPARQL query")
+            return cached
 
-Question: {question}
+        prompt = self._prompt_head + f"""Question: {question}
 
 SPARQL:
         """
@@ -83,13 +101,14 @@ SPARQL:
         for _ in range(3):
             try:
                 response = gemini.generate_content(prompt)
-                match = re.search(r"```sparql(.*?)```", response.text, re.DOTALL)
+                match = _SPARQL_RE.search(response.text)
                 if match:
                     query = match.group(1).strip()
                     if not query.startswith("PREFIX"):
                         query = f"PREFIX ontodm: <https://purl.org/ontodm#>\nPREFIX dcterms: <http://purl.org/dc/terms/>\nFROM <http://example.org/graph/file4>\n" + query
                     elif "FROM" not in query:
                         query = query.replace("WHERE {", "FROM <http://example.org/graph/file4>\nWHERE {")
+                    self._sparql_cache[cache_key] = query
                     return query
             except Exception as e:
                 print(f"Gemini Error: {e}")
@@ -105,13 +124,12 @@ SPARQL:
         }
 
         try:
-            response = self.session.post(
+            response = self._client.post(
                 Config.GRAPHDB_ENDPOINT,
                 headers=headers,
-                data=query,
-                timeout=15
+                content=query
             )
-            return response.json() if response.ok else {"error": f"{response.status_code}: {response.text}"}
+            return response.json() if response.is_success else {"error": f"{response.status_code}: {response.text}"}
         except Exception as e:
             return {"error": str(e)}
 
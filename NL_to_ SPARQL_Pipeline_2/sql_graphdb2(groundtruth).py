@@ -7,6 +7,19 @@ from google.genai import types
 
 load_dotenv()
 
+# Post-processing patterns, compiled once instead of per generated query
+_PREFIX_RE = re.compile(r'(PREFIX[\s\S]*\})')
+_FROM_RE = re.compile(r'\bFROM\b\s*<[^>]+>', re.IGNORECASE)
+_COUNT_HDR_RE = re.compile(r"SELECT\s+(.*?)\s*\(COUNT", re.IGNORECASE)
+
+def _balanced(text: str) -> bool:
+    """True once the generated text contains a query whose braces all close."""
+    start = text.find("PREFIX")
+    if start == -1:
+        return False
+    body = text[start:]
+    return "{" in body and body.count("{") == body.count("}")
+
 class Config:
     GRAPHDB_ENDPOINT = "http://wangyidans-MacBook-Pro.local:7200/repositories/Thesis"
     GEMINI_API_KEY = "your_api_key_here"  # Replace with your actual API key
@@ -130,8 +143,9 @@ Do NOT use UNION for such comparisons.""",
         graph_iri = "http://example.org/graph/enrichmentwithexamples"
         prompt = self._build_prompt(question, graph_iri)
 
-        # Generate via the new client API with temperature control
-        result = client.models.generate_content(
+        # Stream the generation and stop reading as soon as the query's
+        # braces balance — no point waiting for trailing prose/tokens
+        stream = client.models.generate_content_stream(
             model=Config.GEMINI_MODEL_NAME,
             contents=[prompt],
             config=types.GenerateContentConfig(
@@ -140,14 +154,20 @@ Do NOT use UNION for such comparisons.""",
                 candidate_count=1
             )
         )
-        raw = result.text
+        parts = []
+        for chunk in stream:
+            if chunk.text:
+                parts.append(chunk.text)
+                if _balanced("".join(parts)):
+                    break
+        raw = "".join(parts)
 
         # Extract SPARQL (from first PREFIX through the final })
-        match = re.search(r'(PREFIX[\s\S]*\})', raw)
+        match = _PREFIX_RE.search(raw)
         query = match.group(1).strip() if match else raw.strip()
 
         # Strip any accidental FROM clauses
-        query = re.sub(r'\bFROM\b\s*<[^>]+>', '', query, flags=re.IGNORECASE)
+        query = _FROM_RE.sub('', query)
 
         # Wrap WHERE block in GRAPH if missing
         if "GRAPH <" not in query.split("WHERE", 1)[1]:
@@ -160,7 +180,7 @@ Do NOT use UNION for such comparisons.""",
 
         # Auto-append GROUP BY/ORDER BY when COUNT(...) present without GROUP BY
         if "COUNT(" in query.upper() and "GROUP BY" not in query.upper():
-            header = re.search(r"SELECT\s+(.*?)\s*\(COUNT", query, re.IGNORECASE)
+            header = _COUNT_HDR_RE.search(query)
             if header:
                 vars_part = header.group(1).strip()
                 query = query.rstrip() + f"\nGROUP BY {vars_part}\nORDER BY DESC(?feature_count)"